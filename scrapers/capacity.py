@@ -0,0 +1,392 @@
+"""
+Capacity tracking and admission control
+Limits how many scrapes run at once, queues the rest fairly, sheds load
+when the queue would wait too long, and reports saturation for /ready
+
+Scheduling happens per worker: each worker owns MAX_CONCURRENT_SCRAPES
+slots and a queue with two priority lanes (interactive before batch).
+Within a lane, tenants are served round-robin so one client submitting
+a burst cannot starve everyone else.
+
+Counters live in shared memory created at import time, so when gunicorn
+preloads the app (preload_app = True) every forked worker shares them
+and /health reports capacity for the whole service, not just one worker.
+In-flight and waiting counts are kept per worker, so a worker killed
+mid-scrape (whose finally blocks never run) can be cleared by the master
+instead of leaving the service looking saturated forever.
+"""
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.environ.get('SCRAPER_WORKERS', 1))  # Set by gunicorn.conf.py in production
+MAX_CONCURRENT_SCRAPES = int(os.environ.get('SCRAPER_MAX_CONCURRENT_SCRAPES', 2))  # Per worker
+MAX_QUEUE_WAIT = float(os.environ.get('SCRAPER_MAX_QUEUE_WAIT', 60))  # Shed load beyond this (seconds)
+BATCH_SHARE = int(os.environ.get('SCRAPER_BATCH_SHARE', 4))  # Every Nth grant goes to batch if waiting
+DEFAULT_SCRAPE_SECONDS = 30.0  # Wait estimate before any scrape has completed
+
+# The wait check already caps the queue at slots * MAX_QUEUE_WAIT / average
+# scrape time (4 per worker with the defaults), so by default the queue is
+# sized from it. Raise SCRAPER_MAX_QUEUE only if scrapes are much faster.
+MAX_QUEUE = int(os.environ.get(
+    'SCRAPER_MAX_QUEUE',
+    MAX_CONCURRENT_SCRAPES * math.ceil(MAX_QUEUE_WAIT / DEFAULT_SCRAPE_SECONDS)
+))  # Per worker
+
+PRIORITIES = ('interactive', 'batch')
+
+# Shared across forked workers (see module docstring). Workers being replaced
+# overlap with their replacements, hence twice as many slots as workers
+_WORKER_SLOTS = WORKERS * 2
+_slot_pids = multiprocessing.Array('i', _WORKER_SLOTS)
+_in_flight = multiprocessing.Array('i', _WORKER_SLOTS)
+_waiting = multiprocessing.Array('i', _WORKER_SLOTS)
+_completed = multiprocessing.Value('i', 0)
+_rejected = multiprocessing.Value('i', 0)
+_total_seconds = multiprocessing.Value('d', 0.0)
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed instead of queued"""
+
+    def __init__(self, message, retry_after, queue_depth, estimated_wait):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.queue_depth = queue_depth
+        self.estimated_wait = estimated_wait
+
+
+class _Ticket:
+    """A queued request waiting for a scrape slot"""
+
+    __slots__ = ('tenant', 'priority', 'granted', 'evicted', 'enqueued_at')
+
+    def __init__(self, tenant, priority):
+        self.tenant = tenant
+        self.priority = priority
+        self.granted = False
+        self.evicted = False
+        self.enqueued_at = time.monotonic()
+
+
+class AdmissionController:
+    """Per-worker scrape slots with fair, prioritized queueing"""
+
+    def __init__(self, slots):
+        self.slots = slots
+        self.running = 0
+        self.grants = 0
+        self.cond = threading.Condition()
+        # lane -> OrderedDict(tenant -> deque of tickets); dict order is the round-robin order
+        self.lanes = {priority: OrderedDict() for priority in PRIORITIES}
+
+    def _queued(self, priority=None):
+        lanes = [self.lanes[priority]] if priority else self.lanes.values()
+        return sum(len(queue) for lane in lanes for queue in lane.values())
+
+    def _estimate_wait(self, priority):
+        """Seconds a new request in this lane would wait for a slot"""
+        if self.running < self.slots and not self._queued():
+            return 0.0
+
+        ahead = self._queued('interactive') if priority == 'interactive' else self._queued()
+        rounds = math.ceil((ahead + 1) / self.slots)
+        return rounds * average_scrape_seconds()
+
+    def _next_ticket(self):
+        """Pick the next ticket: interactive first, batch every BATCH_SHARE grants"""
+        order = list(PRIORITIES)
+        if BATCH_SHARE > 0 and self.grants % BATCH_SHARE == BATCH_SHARE - 1:
+            order.reverse()
+
+        for priority in order:
+            lane = self.lanes[priority]
+            if lane:
+                tenant, queue = next(iter(lane.items()))
+                ticket = queue.popleft()
+                # Rotate the tenant to the back of the lane (round-robin)
+                del lane[tenant]
+                if queue:
+                    lane[tenant] = queue
+                return ticket
+        return None
+
+    def _remove(self, ticket):
+        lane = self.lanes[ticket.priority]
+        queue = lane.get(ticket.tenant)
+        if queue and ticket in queue:
+            queue.remove(ticket)
+            if not queue:
+                del lane[ticket.tenant]
+
+    def _evict_batch(self):
+        """Drop the newest batch ticket from the busiest batch tenant to make room"""
+        lane = self.lanes['batch']
+        if not lane:
+            return False
+        tenant = max(lane, key=lambda t: len(lane[t]))
+        ticket = lane[tenant][-1]
+        self._remove(ticket)
+        ticket.evicted = True
+        self.cond.notify_all()
+        return True
+
+    def _grant_next(self):
+        while self.running < self.slots:
+            ticket = self._next_ticket()
+            if ticket is None:
+                break
+            ticket.granted = True
+            self.running += 1
+            self.grants += 1
+        self.cond.notify_all()
+
+    def acquire(self, tenant, priority):
+        """
+        Wait for a scrape slot
+
+        Args:
+            tenant: Client identity used for fair scheduling
+            priority: 'interactive' | 'batch'
+
+        Returns:
+            float: Seconds spent waiting in the queue
+
+        Raises:
+            Overloaded: If the queue is full or the estimated wait exceeds MAX_QUEUE_WAIT
+        """
+        with self.cond:
+            if self.running < self.slots and not self._queued():
+                self.running += 1
+                self.grants += 1
+                return 0.0
+
+            # A full queue sheds batch work before turning away interactive requests.
+            # Interactive waits only count interactive tickets, so evicting cannot
+            # change the estimate: decide admission first, then evict.
+            queue_depth = self._queued()
+            estimated_wait = self._estimate_wait(priority)
+            can_evict = priority == 'interactive' and bool(self.lanes['batch'])
+            if estimated_wait > MAX_QUEUE_WAIT or (queue_depth >= MAX_QUEUE and not can_evict):
+                raise Overloaded(
+                    'Scraper queue is full',
+                    retry_after=max(1, math.ceil(min(estimated_wait, MAX_QUEUE_WAIT))),
+                    queue_depth=queue_depth,
+                    estimated_wait=round(estimated_wait, 1)
+                )
+
+            if queue_depth >= MAX_QUEUE:
+                self._evict_batch()
+
+            ticket = _Ticket(tenant, priority)
+            self.lanes[priority].setdefault(tenant, deque()).append(ticket)
+            _add_worker(_waiting, 1)
+            try:
+                # Give up if we waited well past the limit (e.g. scrapes stalled)
+                deadline = ticket.enqueued_at + MAX_QUEUE_WAIT * 2
+                while not ticket.granted:
+                    remaining = deadline - time.monotonic()
+                    if ticket.evicted or remaining <= 0:
+                        self._remove(ticket)
+                        raise Overloaded(
+                            'Evicted by interactive requests' if ticket.evicted
+                            else 'Timed out waiting for a scrape slot',
+                            retry_after=max(1, math.ceil(average_scrape_seconds())),
+                            queue_depth=self._queued(),
+                            estimated_wait=round(self._estimate_wait(priority), 1)
+                        )
+                    self.cond.wait(timeout=remaining)
+            finally:
+                _add_worker(_waiting, -1)
+
+            return time.monotonic() - ticket.enqueued_at
+
+    def release(self):
+        with self.cond:
+            self.running -= 1
+            self._grant_next()
+
+    def stats(self):
+        with self.cond:
+            return {
+                'interactive': self._queued('interactive'),
+                'batch': self._queued('batch'),
+                'tenants': len(set(self.lanes['interactive']) | set(self.lanes['batch'])),
+                'estimated_wait_seconds': round(self._estimate_wait('interactive'), 1),
+            }
+
+
+_controller = None
+
+
+def _reset_controller():
+    """Create this worker's admission controller (call again after fork)"""
+    global _controller
+    _controller = AdmissionController(MAX_CONCURRENT_SCRAPES)
+
+
+_reset_controller()
+
+
+def _add(counter, amount):
+    with counter.get_lock():
+        counter.value += amount
+
+
+_slot = None  # (pid, index) of this process's per-worker counters
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _worker_slot():
+    """Index of this process's per-worker counters, claimed on first use"""
+    global _slot
+    pid = os.getpid()
+    if _slot and _slot[0] == pid:
+        return _slot[1]
+
+    with _slot_pids.get_lock():
+        free = [i for i, slot_pid in enumerate(_slot_pids) if slot_pid == 0]
+        if not free:
+            # A worker died without child_exit clearing it (e.g. the dev server)
+            free = [i for i, slot_pid in enumerate(_slot_pids) if not _pid_alive(slot_pid)]
+            for i in free:
+                _clear_slot(i)
+        index = free[0] if free else pid % _WORKER_SLOTS  # Shared rather than untracked
+        _slot_pids[index] = pid
+
+    _slot = (pid, index)
+    return index
+
+
+def _clear_slot(index):
+    _slot_pids[index] = 0
+    with _in_flight.get_lock():
+        _in_flight[index] = 0
+    with _waiting.get_lock():
+        _waiting[index] = 0
+
+
+def _add_worker(counter, amount):
+    index = _worker_slot()
+    with counter.get_lock():
+        counter[index] += amount
+
+
+def average_scrape_seconds():
+    """Average scrape duration across all workers, or a default before the first scrape"""
+    completed = _completed.value
+    return _total_seconds.value / completed if completed else DEFAULT_SCRAPE_SECONDS
+
+
+@contextmanager
+def scrape_slot(tenant='anonymous', priority='interactive'):
+    """
+    Hold one scrape slot for the duration of a scrape
+
+    Queues behind other requests when this worker is busy and yields the
+    number of seconds the request spent waiting in the queue.
+
+    Args:
+        tenant: Client identity used for fair scheduling
+        priority: 'interactive' | 'batch' (unknown values are treated as batch)
+
+    Raises:
+        Overloaded: If the request is shed instead of queued
+    """
+    if priority not in PRIORITIES:
+        priority = 'batch'
+
+    try:
+        queue_wait = _controller.acquire(tenant, priority)
+    except Overloaded:
+        _add(_rejected, 1)
+        raise
+
+    _add_worker(_in_flight, 1)
+    start = time.monotonic()
+    try:
+        yield queue_wait
+    finally:
+        elapsed = time.monotonic() - start
+        _add_worker(_in_flight, -1)
+        with _completed.get_lock():
+            _completed.value += 1
+            _total_seconds.value += elapsed
+        _controller.release()
+
+
+def snapshot():
+    """
+    Report current capacity across all workers
+
+    Returns:
+        dict: {
+            'status': 'healthy' | 'saturated',
+            'workers': int,
+            'capacity': int (total concurrent scrape slots),
+            'in_flight': int,
+            'queue_depth': int (requests waiting for a slot, all workers),
+            'rejected': int (requests shed with 429 since start),
+            'utilization': float (0.0 - 1.0),
+            'avg_scrape_seconds': float | None,
+            'worker_queue': dict (lanes and estimated wait on the answering worker),
+            'pid': int (worker that answered)
+        }
+    """
+    capacity = WORKERS * MAX_CONCURRENT_SCRAPES
+    in_flight = sum(_in_flight)
+    waiting = sum(_waiting)
+    completed = _completed.value
+
+    return {
+        'status': 'saturated' if in_flight >= capacity and waiting > 0 else 'healthy',
+        'workers': WORKERS,
+        'capacity': capacity,
+        'in_flight': in_flight,
+        'queue_depth': waiting,
+        'rejected': _rejected.value,
+        'utilization': round(min(in_flight / capacity, 1.0), 2) if capacity else 1.0,
+        'avg_scrape_seconds': round(_total_seconds.value / completed, 2) if completed else None,
+        'worker_queue': _controller.stats(),
+        'pid': os.getpid(),
+    }
+
+
+def after_fork():
+    """Give a freshly forked worker its own admission controller and counters"""
+    _reset_controller()
+    _worker_slot()
+    logger.info(f"Worker {os.getpid()} ready with {MAX_CONCURRENT_SCRAPES} scrape slot(s)")
+
+
+def worker_exited(pid):
+    """
+    Drop a dead worker's in-flight and waiting counts (call from the master)
+
+    A worker killed by the graceful timeout never runs its finally blocks,
+    so without this its scrapes would count as in flight indefinitely.
+    """
+    with _slot_pids.get_lock():
+        for index, slot_pid in enumerate(_slot_pids):
+            if slot_pid == pid:
+                if _in_flight[index] or _waiting[index]:
+                    logger.warning(f"Worker {pid} exited with {_in_flight[index]} scrape(s) in flight "
+                                   f"and {_waiting[index]} queued")
+                _clear_slot(index)
@@ -0,0 +1,100 @@
+"""
+Gunicorn configuration for the scraper service (production mode)
+
+Usage:
+    gunicorn -c gunicorn.conf.py server:app
+
+Every scrape can spawn a Scrapy child process and a Chromium instance,
+so workers are recycled after a bounded number of requests to contain
+memory growth, and shutdown waits for in-flight scrapes to finish.
+"""
+import math
+import multiprocessing
+import os
+
+# Binding
+bind = f"0.0.0.0:{os.environ.get('SCRAPER_PORT', 5001)}"
+
+# Workers: each worker runs up to SCRAPER_MAX_CONCURRENT_SCRAPES scrapes and
+# queues up to SCRAPER_MAX_QUEUE more (see capacity.py). The queue defaults to
+# what SCRAPER_MAX_QUEUE_WAIT admits at ~30s per scrape, since a longer queue
+# would be shed by the wait check anyway. Threads cover both, plus spares so
+# /health and 429 responses are always answered
+workers = int(os.environ.get('SCRAPER_WORKERS', min(multiprocessing.cpu_count(), 4)))
+max_concurrent_scrapes = int(os.environ.get('SCRAPER_MAX_CONCURRENT_SCRAPES', 2))
+max_queue_wait = float(os.environ.get('SCRAPER_MAX_QUEUE_WAIT', 60))
+max_queue = int(os.environ.get('SCRAPER_MAX_QUEUE', max_concurrent_scrapes * math.ceil(max_queue_wait / 30)))
+worker_class = 'gthread'
+threads = int(os.environ.get('SCRAPER_THREADS', max_concurrent_scrapes + max_queue + 2))
+
+# Load the app once in the master, then fork. Heavy scraping dependencies
+# are imported lazily (see startup.py): by default each worker pre-warms them
+# in the background after it starts answering /health. Set
+# SCRAPER_PRELOAD_HEAVY=true to import them in the master instead, which
+# shares their memory across workers at the cost of a slower cold start.
+preload_app = True
+preload_heavy = os.environ.get('SCRAPER_PRELOAD_HEAVY', 'false').lower() == 'true'
+
+# Recycle workers to contain Chromium/Scrapy memory growth
+max_requests = int(os.environ.get('SCRAPER_MAX_REQUESTS', 50))
+max_requests_jitter = int(os.environ.get('SCRAPER_MAX_REQUESTS_JITTER', 10))
+
+# A scrape can queue (up to 2x SCRAPER_MAX_QUEUE_WAIT) and then take
+# Scrapy (20s) + Playwright (30s+) + OpenAI, so be generous. Draining on
+# shutdown or recycling must allow for the same worst case, or in-flight
+# scrapes are killed
+timeout = int(os.environ.get('SCRAPER_WORKER_TIMEOUT', 240))
+graceful_timeout = int(os.environ.get('SCRAPER_GRACEFUL_TIMEOUT', timeout))
+keepalive = 5
+
+# Logging
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('SCRAPER_LOG_LEVEL', 'info')
+
+# capacity.py reads these when the app is preloaded below
+os.environ['SCRAPER_WORKERS'] = str(workers)
+os.environ['SCRAPER_MAX_CONCURRENT_SCRAPES'] = str(max_concurrent_scrapes)
+os.environ['SCRAPER_MAX_QUEUE'] = str(max_queue)
+
+
+def when_ready(server):
+    """Runs in the master before the first workers are forked"""
+    if preload_heavy:
+        import startup
+        timings = startup.profile_imports()
+        server.log.info(f"Preloaded heavy modules in {sum(t['seconds'] for t in timings):.2f}s")
+
+
+def post_fork(server, worker):
+    """Give each worker its own scrape slots and startup clock"""
+    import capacity
+    import startup
+    capacity.after_fork()
+    startup.after_fork()
+
+
+def post_worker_init(worker):
+    """Worker is about to accept requests: start pre-warming in the background"""
+    import startup
+    startup.mark_ready()
+    if not preload_heavy:
+        startup.start_prewarm()
+
+
+def worker_exit(server, worker):
+    """Make sure no Scrapy/Chromium children outlive a recycled worker"""
+    for child in multiprocessing.active_children():
+        server.log.info(f"Worker {worker.pid} exiting, terminating child process {child.pid}")
+        child.terminate()
+        child.join(timeout=5)
+
+
+def child_exit(server, worker):
+    """Runs in the master: forget the capacity counts of a worker that is gone"""
+    import capacity
+    capacity.worker_exited(worker.pid)
+
+
+def on_exit(server):
+    server.log.info("Scraper service stopped")
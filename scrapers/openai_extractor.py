@@ -10,6 +10,109 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+SYSTEM_PROMPT = "You are an expert at analyzing business websites and extracting the most compelling and meaningful information. You provide concise, informative summaries that highlight what makes a business unique and valuable."
+
+
+def _build_messages(content_summary, url, max_snippets):
+    """Build the chat messages asking for a numbered list of snippets"""
+    prompt = f"""Analyze the following website content from {url} and extract {max_snippets} of the most interesting and meaningful points about this business, product, or service.
+
+Website Content:
+{content_summary}
+
+Instructions:
+- Extract the most compelling and informative points
+- Focus on what makes this business unique, their key services/products, value propositions
+- Keep each point concise but informative (1-2 sentences max)
+- Prioritize actionable information a potential customer would want to know
+- Return ONLY the numbered list, no additional commentary
+- Format: Return exactly {max_snippets} items in the format "1. Point one\\n2. Point two\\n..." etc.
+
+Return the {max_snippets} most interesting points as a numbered list:"""
+
+    return [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+
+def _parse_numbered_line(line, max_snippets):
+    """Return the text of a "N. text" line, or None if it is not a numbered item"""
+    line = line.strip()
+    # Remove numbering and clean up
+    if line and any(line.startswith(f"{i}.") for i in range(1, max_snippets + 2)):
+        # Remove the number and period
+        cleaned = line.split('.', 1)[1].strip() if '.' in line else line
+        return cleaned or None
+    return None
+
+
+class NumberedListParser:
+    """
+    Incrementally parse a numbered list as text arrives
+
+    feed() returns each snippet as soon as its line is complete. close()
+    flushes the last line, and falls back to every non-empty line if the
+    model never produced a numbered item.
+    """
+
+    def __init__(self, max_snippets=10):
+        self.max_snippets = max_snippets
+        self.buffer = ''
+        self.count = 0
+        self.unnumbered = []
+
+    def _parse(self, line):
+        snippet = _parse_numbered_line(line, self.max_snippets)
+        if snippet is None:
+            if line.strip():
+                self.unnumbered.append(line.strip())
+            return []
+        if self.count >= self.max_snippets:
+            return []
+        self.count += 1
+        return [snippet]
+
+    def feed(self, text):
+        """
+        Add streamed text
+
+        Returns:
+            list: Snippets whose lines completed with this text
+        """
+        self.buffer += text
+        snippets = []
+        while '\n' in self.buffer:
+            line, self.buffer = self.buffer.split('\n', 1)
+            snippets.extend(self._parse(line))
+        return snippets
+
+    def close(self):
+        """
+        Flush the final line
+
+        Returns:
+            list: Remaining snippets
+        """
+        snippets = self._parse(self.buffer)
+        self.buffer = ''
+        if not self.count and not snippets:
+            # Fallback: just split by newlines if parsing failed
+            snippets = self.unnumbered[:self.max_snippets]
+            self.count = len(snippets)
+        return snippets
+
+    @property
+    def done(self):
+        return self.count >= self.max_snippets
+
+
 def extract_meaningful_snippets(scraped_items, url, max_snippets=10):
     """
     Use OpenAI to extract the most meaningful and interesting snippets from scraped content
@@ -52,35 +155,10 @@ def extract_meaningful_snippets(scraped_items, url, max_snippets=10):
         # Initialize OpenAI client
         client = OpenAI(api_key=api_key)
 
-        # Create the prompt
-        prompt = f"""Analyze the following website content from {url} and extract {max_snippets} of the most interesting and meaningful points about this business, product, or service.
-
-Website Content:
-{content_summary}
-
-Instructions:
-- Extract the most compelling and informative points
-- Focus on what makes this business unique, their key services/products, value propositions
-- Keep each point concise but informative (1-2 sentences max)
-- Prioritize actionable information a potential customer would want to know
-- Return ONLY the numbered list, no additional commentary
-- Format: Return exactly {max_snippets} items in the format "1. Point one\\n2. Point two\\n..." etc.
-
-Return the {max_snippets} most interesting points as a numbered list:"""
-
         # Call OpenAI API
         response = client.chat.completions.create(
             model=os.environ.get('OPENAI_MODEL', 'gpt-4o-mini'),  # Use gpt-4o-mini for cost efficiency
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert at analyzing business websites and extracting the most compelling and meaningful information. You provide concise, informative summaries that highlight what makes a business unique and valuable."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
+            messages=_build_messages(content_summary, url, max_snippets),
             temperature=0.3,  # Lower temperature for more consistent, factual extraction
             max_tokens=500
         )
@@ -92,13 +170,9 @@ Return the {max_snippets} most interesting points as a numbered list:"""
         # Parse the numbered list
         snippets = []
         for line in extracted_text.split('\n'):
-            line = line.strip()
-            # Remove numbering and clean up
-            if line and any(line.startswith(f"{i}.") for i in range(1, max_snippets + 2)):
-                # Remove the number and period
-                cleaned = line.split('.', 1)[1].strip() if '.' in line else line
-                if cleaned:
-                    snippets.append(cleaned)
+            snippet = _parse_numbered_line(line, max_snippets)
+            if snippet:
+                snippets.append(snippet)
 
         if not snippets:
             # Fallback: just split by newlines if parsing failed
@@ -119,6 +193,64 @@ Return the {max_snippets} most interesting points as a numbered list:"""
         }
 
 
+def stream_meaningful_snippets(scraped_items, url, max_snippets=10):
+    """
+    Streaming version of extract_meaningful_snippets
+
+    Uses the streaming completions API and yields each snippet as soon as
+    its numbered line is complete, instead of waiting for the full response.
+
+    Args:
+        scraped_items: List of scraped page data (from Scrapy or Playwright)
+        url: The website URL being analyzed
+        max_snippets: Maximum number of snippets to extract (default: 10)
+
+    Yields:
+        str: Snippets, in order
+
+    Raises:
+        RuntimeError: If OpenAI is not configured or there is nothing to analyze
+        Exception: Errors from the OpenAI API (snippets already yielded stay valid)
+    """
+    api_key = os.environ.get('OPENAI_API_KEY')
+    if not api_key:
+        raise RuntimeError('OpenAI API key not configured')
+
+    content_summary = prepare_content_for_analysis(scraped_items)
+    if not content_summary:
+        raise RuntimeError('No content available for analysis')
+
+    logger.info(f"Streaming {len(content_summary)} characters to OpenAI for analysis...")
+
+    client = OpenAI(api_key=api_key)
+    stream = client.chat.completions.create(
+        model=os.environ.get('OPENAI_MODEL', 'gpt-4o-mini'),
+        messages=_build_messages(content_summary, url, max_snippets),
+        temperature=0.3,
+        max_tokens=500,
+        stream=True
+    )
+
+    parser = NumberedListParser(max_snippets)
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if text:
+                yield from parser.feed(text)
+            if parser.done:
+                break
+        yield from parser.close()
+    finally:
+        # Stop generating tokens we no longer need (or the client went away)
+        response = getattr(stream, 'response', None)
+        if response is not None:
+            response.close()
+
+    logger.info(f"OpenAI streaming extraction finished with {parser.count} snippets")
+
+
 def prepare_content_for_analysis(scraped_items):
     """
     Prepare scraped content for OpenAI analysis by combining and formatting it
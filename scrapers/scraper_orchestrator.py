@@ -1,113 +1,299 @@
 """
 Scraper Orchestrator
 Tries Scrapy first, falls back to Playwright if needed
+Remembers per-domain which strategy works to skip futile attempts
+Reuses the HTML Scrapy already downloaded to decide whether rendering is needed
 Uses OpenAI to extract meaningful snippets
 """
 import logging
 import os
-from scrapy_scraper import scrape_with_scrapy, format_scrapy_results
-from playwright_scraper import scrape_with_playwright, format_playwright_results
-from openai_extractor import extract_meaningful_snippets, format_snippets_as_numbered_list
+import time
+from strategy_memory import detect_platform, recommend_strategy, record_outcome
+
+# scrapy_scraper, playwright_scraper and openai_extractor pull in scrapy,
+# playwright, bs4/lxml and openai, so they are imported on first use of each
+# strategy rather than here (see startup.py for profiling and pre-warming)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def scrape_website(url):
+def _timed(scrape_fn, url, **kwargs):
+    """Run a scraper and return (results, elapsed seconds)"""
+    start = time.monotonic()
+    results = scrape_fn(url, **kwargs)
+    return results, time.monotonic() - start
+
+
+def _success_response(results, url, method, fallback_formatter, strategy_source):
+    """
+    Build the success response, using OpenAI extraction when enabled
+
+    Args:
+        results: Scraper results dict with 'items' and 'pages_found'
+        url: Website URL that was scraped
+        method: 'scrapy' | 'playwright'
+        fallback_formatter: Formatter used if OpenAI is disabled or fails
+        strategy_source: Why this strategy was chosen (see recommend_strategy)
+
+    Returns:
+        dict: Orchestrator response (see scrape_website)
+    """
+    # Try OpenAI extraction for intelligent snippet selection
+    use_openai = os.environ.get('USE_OPENAI_EXTRACTION', 'true').lower() == 'true'
+
+    if use_openai:
+        from openai_extractor import extract_meaningful_snippets, format_snippets_as_numbered_list
+
+        logger.info("Attempting OpenAI extraction...")
+        openai_result = extract_meaningful_snippets(results['items'], url)
+
+        if openai_result['success'] and openai_result['snippets']:
+            logger.info(f"OpenAI extraction successful! Extracted {len(openai_result['snippets'])} snippets")
+            formatted_message = format_snippets_as_numbered_list(openai_result['snippets'])
+        else:
+            logger.warning(f"OpenAI extraction failed: {openai_result['error']}, using fallback")
+            formatted_message = fallback_formatter(results)
+    else:
+        formatted_message = fallback_formatter(results)
+
+    return {
+        'status': 'success',
+        'message': formatted_message,
+        'method_used': method + (' + openai' if use_openai else ''),
+        'pages_found': results['pages_found'],
+        'strategy_source': strategy_source,
+        'error_details': None
+    }
+
+
+def _collect(url):
     """
-    Orchestrate web scraping: Try Scrapy first, fallback to Playwright
+    Run the scrapers: Try Scrapy first, fallback to Playwright
 
     Strategy:
-    1. Try Scrapy first (faster, works for most sites)
-    2. If Scrapy finds <= 1 page, use Playwright (handles JS-heavy sites)
+    1. Ask strategy memory which method has worked for this domain/platform
+    2. Try Scrapy first (faster, works for most sites) unless it is known to be futile
+    3. If Scrapy finds 1 page, check its HTML: a server-rendered page is used as-is
+    4. Otherwise use Playwright (handles JS-heavy sites), merging in what Scrapy found
+    5. If Scrapy was skipped and Playwright fails, give Scrapy a chance after all
 
     Args:
         url: Website URL to scrape
 
     Returns:
         dict: {
-            'status': 'success' | 'error',
-            'message': str (numbered list of items),
-            'method_used': 'scrapy' | 'playwright',
-            'pages_found': int,
-            'error_details': str (if error)
+            'results': scraper results (see scrape_with_scrapy / scrape_with_playwright),
+            'method': 'scrapy' | 'playwright',
+            'formatter': formatter for the results if OpenAI is disabled or fails,
+            'strategy_source': see recommend_strategy
         }
+        or {'error': error response (see scrape_website)} if both scrapers failed
     """
     logger.info(f"Starting scrape orchestration for: {url}")
 
-    # Step 1: Try Scrapy first
-    logger.info("Attempting Scrapy scrape...")
-    scrapy_results = scrape_with_scrapy(url, timeout=20)
+    use_memory = os.environ.get('USE_STRATEGY_MEMORY', 'true').lower() == 'true'
+    if use_memory:
+        decision = recommend_strategy(url)
+        logger.info(f"Strategy memory suggests {decision['strategy']} "
+                    f"(source: {decision['source']}, platform: {decision['platform']})")
+    else:
+        decision = {'strategy': 'scrapy', 'source': 'default', 'platform': None}
 
-    # Check if Scrapy was successful and found enough pages
-    if scrapy_results['success'] and scrapy_results['pages_found'] > 1:
-        logger.info(f"Scrapy succeeded! Found {scrapy_results['pages_found']} pages")
+    def remember(strategy, results, duration, scrapy_attempted, scrapy_futile=False):
+        if use_memory:
+            record_outcome(url, strategy, results['success'], results['pages_found'], duration,
+                           scrapy_attempted=scrapy_attempted, scrapy_futile=scrapy_futile,
+                           platform=decision['platform'])
 
-        # Try OpenAI extraction for intelligent snippet selection
-        use_openai = os.environ.get('USE_OPENAI_EXTRACTION', 'true').lower() == 'true'
+    # Step 1: Try Scrapy first (unless memory says it is futile for this site)
+    scrapy_results = None
+    if decision['strategy'] == 'scrapy':
+        from scrapy_scraper import scrape_with_scrapy, format_scrapy_results
 
-        if use_openai:
-            logger.info("Attempting OpenAI extraction...")
-            openai_result = extract_meaningful_snippets(scrapy_results['items'], url)
+        logger.info("Attempting Scrapy scrape...")
+        scrapy_results, duration = _timed(scrape_with_scrapy, url, timeout=20)
 
-            if openai_result['success'] and openai_result['snippets']:
-                logger.info(f"OpenAI extraction successful! Extracted {len(openai_result['snippets'])} snippets")
-                formatted_message = format_snippets_as_numbered_list(openai_result['snippets'])
-            else:
-                logger.warning(f"OpenAI extraction failed: {openai_result['error']}, using fallback")
-                formatted_message = format_scrapy_results(scrapy_results)
-        else:
-            formatted_message = format_scrapy_results(scrapy_results)
+        # Fingerprint every page Scrapy downloads, so platform records learn from
+        # Scrapy's successes as well as its failures
+        if scrapy_results.get('start_html'):
+            decision['platform'] = detect_platform(scrapy_results['start_html']) or decision['platform']
 
-        return {
-            'status': 'success',
-            'message': formatted_message,
-            'method_used': 'scrapy' + (' + openai' if use_openai else ''),
-            'pages_found': scrapy_results['pages_found'],
-            'error_details': None
-        }
+        # Check if Scrapy was successful and found enough pages
+        if scrapy_results['success'] and scrapy_results['pages_found'] > 1:
+            logger.info(f"Scrapy succeeded! Found {scrapy_results['pages_found']} pages")
+            remember('scrapy', scrapy_results, duration, scrapy_attempted=True)
+            return {
+                'results': scrapy_results,
+                'method': 'scrapy',
+                'formatter': format_scrapy_results,
+                'strategy_source': decision['source']
+            }
 
-    # Step 2: Fallback to Playwright
-    logger.info(f"Scrapy found {scrapy_results['pages_found']} page(s). Falling back to Playwright...")
-    playwright_results = scrape_with_playwright(url, timeout=30000)
+        # Scrapy already downloaded the start page: use it to decide whether rendering is needed
+        if scrapy_results['success'] and scrapy_results.get('start_html'):
+            from spa_detector import analyze_html
 
-    if playwright_results['success']:
-        logger.info("Playwright scraping succeeded!")
+            analysis = analyze_html(scrapy_results['start_html'])
 
-        # Try OpenAI extraction for intelligent snippet selection
-        use_openai = os.environ.get('USE_OPENAI_EXTRACTION', 'true').lower() == 'true'
+            if scrapy_results['pages_found'] == 1 and not analysis['needs_rendering']:
+                logger.info(f"Start page is server-rendered ({analysis['text_length']} chars of text), "
+                            f"skipping Playwright")
+                remember('scrapy', scrapy_results, duration, scrapy_attempted=True)
+                return {
+                    'results': scrapy_results,
+                    'method': 'scrapy',
+                    'formatter': format_scrapy_results,
+                    'strategy_source': decision['source']
+                }
 
-        if use_openai:
-            logger.info("Attempting OpenAI extraction...")
-            openai_result = extract_meaningful_snippets(playwright_results['items'], url)
+            logger.info(f"Start page needs rendering: {', '.join(analysis['reasons'])}")
 
-            if openai_result['success'] and openai_result['snippets']:
-                logger.info(f"OpenAI extraction successful! Extracted {len(openai_result['snippets'])} snippets")
-                formatted_message = format_snippets_as_numbered_list(openai_result['snippets'])
-            else:
-                logger.warning(f"OpenAI extraction failed: {openai_result['error']}, using fallback")
-                formatted_message = format_playwright_results(playwright_results)
-        else:
-            formatted_message = format_playwright_results(playwright_results)
+        logger.info(f"Scrapy found {scrapy_results['pages_found']} page(s). Falling back to Playwright...")
+    else:
+        logger.info("Skipping Scrapy, going straight to Playwright...")
+
+    # Step 2: Playwright (fallback, or first choice for client-rendered sites)
+    from playwright_scraper import scrape_with_playwright, format_playwright_results
+
+    playwright_results, duration = _timed(scrape_with_playwright, url, timeout=30000)
+    remember('playwright', playwright_results, duration,
+             scrapy_attempted=scrapy_results is not None,
+             scrapy_futile=scrapy_results is not None)
 
+    if playwright_results['success']:
+        logger.info("Playwright scraping succeeded!")
+        if scrapy_results is not None:
+            from spa_detector import merge_results
+
+            # Keep whatever Scrapy found instead of discarding it
+            playwright_results = merge_results(playwright_results, scrapy_results)
         return {
-            'status': 'success',
-            'message': formatted_message,
-            'method_used': 'playwright' + (' + openai' if use_openai else ''),
-            'pages_found': playwright_results['pages_found'],
-            'error_details': None
+            'results': playwright_results,
+            'method': 'playwright',
+            'formatter': format_playwright_results,
+            'strategy_source': decision['source']
         }
 
-    # Step 3: Both methods failed
+    # Step 3: Memory sent us straight to Playwright and it failed - try Scrapy after all
+    if scrapy_results is None:
+        from scrapy_scraper import scrape_with_scrapy, format_scrapy_results
+
+        logger.info("Playwright failed. Trying Scrapy despite strategy memory...")
+        scrapy_results, duration = _timed(scrape_with_scrapy, url, timeout=20)
+        scrapy_ok = scrapy_results['success'] and scrapy_results['pages_found'] > 1
+        remember('scrapy', scrapy_results, duration, scrapy_attempted=True, scrapy_futile=not scrapy_ok)
+
+        if scrapy_ok:
+            logger.info(f"Scrapy succeeded! Found {scrapy_results['pages_found']} pages")
+            return {
+                'results': scrapy_results,
+                'method': 'scrapy',
+                'formatter': format_scrapy_results,
+                'strategy_source': decision['source']
+            }
+
+    # Step 4: Both methods failed
     logger.error("Both Scrapy and Playwright failed")
     error_message = f"Scrapy error: {scrapy_results['error']}. Playwright error: {playwright_results['error']}"
 
-    return {
+    return {'error': {
         'status': 'error',
         'message': '1. Failed to scrape website content\n2. Please check if the URL is accessible',
         'method_used': None,
         'pages_found': 0,
+        'strategy_source': decision['source'],
         'error_details': error_message
+    }}
+
+
+def scrape_website(url):
+    """
+    Orchestrate web scraping: Try Scrapy first, fallback to Playwright,
+    then extract snippets with OpenAI (see _collect for the strategy)
+
+    Args:
+        url: Website URL to scrape
+
+    Returns:
+        dict: {
+            'status': 'success' | 'error',
+            'message': str (numbered list of items),
+            'method_used': 'scrapy' | 'playwright',
+            'pages_found': int,
+            'strategy_source': 'domain' | 'platform' | 'reprobe' | 'probe' | 'default',
+            'error_details': str (if error)
+        }
+    """
+    scraped = _collect(url)
+    if 'error' in scraped:
+        return scraped['error']
+
+    return _success_response(scraped['results'], url, scraped['method'], scraped['formatter'],
+                             scraped['strategy_source'])
+
+
+def scrape_website_stream(url):
+    """
+    Streaming version of scrape_website
+
+    Scrapes as usual, then streams OpenAI extraction so each snippet is
+    delivered as soon as the model finishes writing it.
+
+    Args:
+        url: Website URL to scrape
+
+    Yields:
+        dict: Events, in order:
+            {'event': 'status', 'stage': 'scraping'}
+            {'event': 'status', 'stage': 'extracting', 'method_used': str, 'pages_found': int}
+            {'event': 'snippet', 'index': int (1-based), 'text': str}   (repeated)
+            {'event': 'done', ...same fields as the scrape_website response}
+    """
+    logger.info(f"Starting streaming scrape for: {url}")
+    yield {'event': 'status', 'stage': 'scraping'}
+
+    scraped = _collect(url)
+    if 'error' in scraped:
+        yield {'event': 'done', **scraped['error']}
+        return
+
+    results = scraped['results']
+    use_openai = os.environ.get('USE_OPENAI_EXTRACTION', 'true').lower() == 'true'
+    method_used = scraped['method'] + (' + openai' if use_openai else '')
+    yield {'event': 'status', 'stage': 'extracting', 'method_used': method_used,
+           'pages_found': results['pages_found']}
+
+    snippets = []
+    if use_openai:
+        from openai_extractor import stream_meaningful_snippets
+
+        logger.info("Attempting streaming OpenAI extraction...")
+        try:
+            for snippet in stream_meaningful_snippets(results['items'], url):
+                snippets.append(snippet)
+                yield {'event': 'snippet', 'index': len(snippets), 'text': snippet}
+            logger.info(f"OpenAI extraction successful! Extracted {len(snippets)} snippets")
+        except Exception as e:
+            # Keep whatever already reached the client; only fall back if nothing did
+            logger.warning(f"OpenAI streaming extraction failed after {len(snippets)} snippets: {e}")
+
+    if not snippets:
+        logger.info("Using fallback formatting")
+        for line in scraped['formatter'](results).split('\n'):
+            text = line.split('. ', 1)[1] if '. ' in line else line
+            if text.strip():
+                snippets.append(text.strip())
+                yield {'event': 'snippet', 'index': len(snippets), 'text': snippets[-1]}
+
+    yield {
+        'event': 'done',
+        'status': 'success',
+        'message': '\n'.join(f"{i+1}. {snippet}" for i, snippet in enumerate(snippets)),
+        'method_used': method_used,
+        'pages_found': results['pages_found'],
+        'strategy_source': scraped['strategy_source'],
+        'error_details': None
     }
 
 
@@ -115,12 +301,23 @@ if __name__ == '__main__':
     # Test the orchestrator
     import sys
 
-    test_url = sys.argv[1] if len(sys.argv) > 1 else 'https://example.com'
+    args = [arg for arg in sys.argv[1:] if arg != '--stream']
+    test_url = args[0] if args else 'https://example.com'
     print(f"\n{'='*60}")
     print(f"Testing Scraper Orchestrator on: {test_url}")
     print(f"{'='*60}\n")
 
-    result = scrape_website(test_url)
+    if '--stream' in sys.argv:
+        start = time.monotonic()
+        for event in scrape_website_stream(test_url):
+            if event['event'] == 'snippet':
+                print(f"[{time.monotonic() - start:6.2f}s] {event['index']}. {event['text']}")
+            elif event['event'] == 'status':
+                print(f"[{time.monotonic() - start:6.2f}s] {event['stage']}...")
+            else:
+                result = event
+    else:
+        result = scrape_website(test_url)
 
     print(f"\nStatus: {result['status']}")
     print(f"Method Used: {result['method_used']}")
@@ -3,18 +3,33 @@ Scrapy-based web scraper
 Extracts meaningful content from websites including text, links, and headings
 """
 import scrapy
+from scrapy import signals
 from scrapy.crawler import CrawlerProcess
+from scrapy.exceptions import DontCloseSpider
 from scrapy.http import TextResponse
 from bs4 import BeautifulSoup
 import logging
 from urllib.parse import urljoin, urlparse
 import multiprocessing
 from queue import Queue, Empty
-import time
+from datetime import datetime, timezone
+import startup
+from strategy_memory import domain_key
+from url_frontier import UrlFrontier, iter_sitemap, score_sitemap, sitemaps_from_robots
 
 # Disable scrapy logging noise
 logging.getLogger('scrapy').setLevel(logging.WARNING)
 
+MAX_START_HTML = 500_000  # Keep the start page's raw HTML (for SPA detection) up to this size
+MAX_PAGES = 20  # Page budget per scrape
+MAX_LINK_DEPTH = 2  # Only follow on-page links 2 levels deep
+MAX_SITEMAP_FETCHES = 6  # robots.txt-listed sitemaps plus child sitemaps of an index
+MAX_CHILD_SITEMAPS = 3  # Child sitemaps to open from a sitemap index
+SITEMAP_WAIT = 3.0  # Seconds to wait for sitemaps before dispatching the frontier anyway
+SITEMAP_TIMEOUT = 8  # Download timeout for sitemaps (seconds)
+SITEMAP_BONUS = 2.0  # Sitemap-listed URLs beat on-page links of similar value
+LINKS_PER_PAGE = 50  # On-page links considered per page
+
 
 class ContentSpider(scrapy.Spider):
     name = 'content_spider'
@@ -22,27 +37,170 @@ class ContentSpider(scrapy.Spider):
         'USER_AGENT': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
         'ROBOTSTXT_OBEY': True,
         'CONCURRENT_REQUESTS': 8,
+        'CONCURRENT_REQUESTS_PER_DOMAIN': 6,  # Fetch the frontier in one parallel wave
         'DOWNLOAD_TIMEOUT': 15,
-        'DEPTH_LIMIT': 2,  # Only go 2 levels deep
-        'CLOSESPIDER_PAGECOUNT': 20,  # Maximum 20 pages
+        'DEPTH_LIMIT': 0,  # Link depth is enforced by the spider (sitemap hops don't count)
+        'CLOSESPIDER_PAGECOUNT': MAX_PAGES + MAX_SITEMAP_FETCHES + 2,  # Safety net; the spider keeps its own budget
         'HTTPCACHE_ENABLED': False,
         'REDIRECT_ENABLED': True,
         'COOKIES_ENABLED': False,
-        'DOWNLOAD_DELAY': 0.5,  # Be polite
+        'DOWNLOAD_DELAY': 0,  # The page budget caps the total load on the site
     }
 
     def __init__(self, start_url, results_queue, *args, **kwargs):
         super(ContentSpider, self).__init__(*args, **kwargs)
         self.start_urls = [start_url]
-        self.allowed_domains = [urlparse(start_url).netloc]
+        # Bare domains usually redirect to www (or the other way round): allow both
+        self.allowed_domains = [domain_key(start_url)]
+        self.site_key = domain_key(start_url)
         self.results_queue = results_queue
         self.scraped_items = []
         self.pages_scraped = 0
+        self.start_html = None
+
+        # URL frontier, seeded from sitemaps and on-page links
+        self.frontier = UrlFrontier()
+        self.frontier.mark_seen(start_url)
+        self.url_depths = {}  # Frontier URL -> link depth it was discovered at
+        self.pages_requested = 1  # The start page
+        self.pending_sitemaps = 0  # Sitemap requests still waiting for a callback or errback
+        self.sitemaps_seen = set()
+        self.sitemap_wait_expired = False
+        self.sitemap_timer = None
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super(ContentSpider, cls).from_crawler(crawler, *args, **kwargs)
+        crawler.signals.connect(spider.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(spider.spider_idle, signal=signals.spider_idle)
+        crawler.signals.connect(spider.response_received, signal=signals.response_received)
+        return spider
+
+    def spider_opened(self, spider):
+        """Start the SITEMAP_WAIT deadline, after which the frontier is dispatched regardless"""
+        from twisted.internet import reactor
+
+        self.sitemap_timer = reactor.callLater(SITEMAP_WAIT, self._sitemap_wait_expired)
+
+    def _sitemap_wait_expired(self):
+        self.sitemap_wait_expired = True
+        self._schedule(self._dispatch())
+
+    def spider_idle(self, spider):
+        """Nothing in flight: dispatch whatever the frontier holds before letting the spider close"""
+        if self._schedule(self._dispatch(force=True)):
+            raise DontCloseSpider
+
+    def response_received(self, response, request, spider):
+        """
+        Seed sitemaps from the robots.txt ROBOTSTXT_OBEY already downloads
+
+        RobotsTxtMiddleware fetches robots.txt for every host before the
+        first request to it, so this runs before the start page is parsed.
+        """
+        if not request.meta.get('dont_obey_robotstxt') or urlparse(response.url).path != '/robots.txt':
+            return
+        if response.status != 200 or not isinstance(response, TextResponse):
+            return
+
+        for sitemap_url in sitemaps_from_robots(response.text):
+            if self._same_site(sitemap_url):
+                self._schedule(self._sitemap_request(sitemap_url))
+
+    def _schedule(self, requests):
+        """Hand requests to the engine from outside a callback; returns how many were scheduled"""
+        count = 0
+        for request in requests:
+            self.crawler.engine.crawl(request)
+            count += 1
+        return count
+
+    def start_requests(self):
+        """Request the start page and sitemap.xml at once (robots.txt comes via ROBOTSTXT_OBEY)"""
+        start_url = self.start_urls[0]
+        parsed = urlparse(start_url)
+        root = f"{parsed.scheme}://{parsed.netloc}"
+
+        yield scrapy.Request(start_url, callback=self.parse, priority=100,
+                             meta={'is_start': True, 'link_depth': 0})
+        yield from self._sitemap_request(f"{root}/sitemap.xml")
+
+    def _same_site(self, url):
+        """Same site as the start page, ignoring a leading "www." on either side"""
+        return domain_key(url) == self.site_key
+
+    def _sitemap_request(self, url):
+        """
+        Yield a request for a sitemap we have not asked for yet
+
+        Sitemaps are deduplicated here and sent with dont_filter=True, so
+        Scrapy's dupefilter never drops one silently - every request counted
+        in pending_sitemaps is guaranteed a callback or errback.
+        """
+        key = domain_key(url) + urlparse(url).path  # http://x.com and https://www.x.com are the same sitemap
+        if key in self.sitemaps_seen or len(self.sitemaps_seen) >= MAX_SITEMAP_FETCHES:
+            return
+
+        self.sitemaps_seen.add(key)
+        self.pending_sitemaps += 1
+        yield scrapy.Request(url, callback=self.parse_sitemap, errback=self.sitemap_failed, priority=90,
+                             dont_filter=True, meta={'download_timeout': SITEMAP_TIMEOUT})
+
+    def _dispatch(self, force=False):
+        """
+        Send the best frontier URLs out in parallel, up to the page budget
+
+        Waits until sitemap discovery finishes (or SITEMAP_WAIT passes) so
+        sitemap-listed pages compete with on-page links for the budget.
+        """
+        if not force and self.pending_sitemaps > 0 and not self.sitemap_wait_expired:
+            return
+
+        for url, score in self.frontier.pop(MAX_PAGES - self.pages_requested):
+            self.pages_requested += 1
+            yield scrapy.Request(url, callback=self.parse, priority=int(score),
+                                 meta={'link_depth': self.url_depths.get(url, 1)})
+
+    def parse_sitemap(self, response):
+        """Stream a sitemap or sitemap index into the frontier"""
+        self.pending_sitemaps -= 1
+
+        child_sitemaps = []
+        added = 0
+        for entry in iter_sitemap(response.body):
+            if not self._same_site(entry['loc']):
+                continue
+            if entry['kind'] == 'sitemap':
+                child_sitemaps.append(entry)
+            elif self.frontier.add(entry['loc'], entry['lastmod'], entry['priority'], bonus=SITEMAP_BONUS):
+                added += 1
+
+        if added:
+            self.logger.info(f"Sitemap {response.url} added {added} URL(s) to the frontier")
+
+        # Sitemap index: open the most promising, most recently updated children
+        oldest = datetime.min.replace(tzinfo=timezone.utc)
+        child_sitemaps.sort(key=lambda e: (score_sitemap(e['loc']), e['lastmod'] or oldest), reverse=True)
+        for entry in child_sitemaps[:MAX_CHILD_SITEMAPS]:
+            yield from self._sitemap_request(entry['loc'])
+
+        yield from self._dispatch()
+
+    def sitemap_failed(self, failure):
+        """A sitemap could not be fetched (usually a 404)"""
+        self.pending_sitemaps -= 1
+        yield from self._dispatch()
 
     def parse(self, response):
         """Parse each page and extract meaningful content"""
         self.pages_scraped += 1
 
+        # Keep the raw start page so the orchestrator can decide whether
+        # rendering is needed without downloading it again
+        if response.meta.get('is_start'):
+            self.start_html = response.text[:MAX_START_HTML]
+            self.frontier.mark_seen(response.url)  # Host and scheme after redirects
+
         # Extract text content
         soup = BeautifulSoup(response.text, 'lxml')
 
@@ -74,20 +232,28 @@ class ContentSpider(scrapy.Spider):
             if text and len(text) > 20:  # Only substantial paragraphs
                 page_data['paragraphs'].append(text)
 
-        # Get internal links for crawling
-        for link in response.css('a::attr(href)').getall()[:10]:
+        # Get internal links for crawling (queued in the frontier by value, not page order)
+        link_depth = response.meta.get('link_depth', 1)
+        for link in response.css('a::attr(href)').getall()[:LINKS_PER_PAGE]:
             absolute_url = urljoin(response.url, link)
-            if urlparse(absolute_url).netloc in self.allowed_domains:
+            if self._same_site(absolute_url):
                 page_data['links'].append(absolute_url)
-                yield scrapy.Request(absolute_url, callback=self.parse, dont_filter=False)
+                if link_depth < MAX_LINK_DEPTH and self.frontier.add(absolute_url):
+                    self.url_depths[absolute_url.split('#')[0]] = link_depth + 1
 
         self.scraped_items.append(page_data)
 
+        yield from self._dispatch()
+
     def closed(self, reason):
         """Called when spider finishes - put results in queue"""
+        if self.sitemap_timer is not None and self.sitemap_timer.active():
+            self.sitemap_timer.cancel()
+
         self.results_queue.put({
             'items': self.scraped_items,
-            'pages_scraped': self.pages_scraped
+            'pages_scraped': self.pages_scraped,
+            'start_html': self.start_html
         })
 
 
@@ -111,9 +277,13 @@ def scrape_with_scrapy(url, timeout=30):
             'success': bool,
             'pages_found': int,
             'items': list of extracted content,
+            'start_html': str | None (raw HTML of the first page fetched),
             'error': str (if failed)
         }
     """
+    # Both the Manager and the spider fork: not while pre-warm holds an import lock
+    startup.wait_for_prewarm()
+
     # Create a queue for results
     manager = multiprocessing.Manager()
     results_queue = manager.Queue()
@@ -134,6 +304,7 @@ def scrape_with_scrapy(url, timeout=30):
             'success': False,
             'pages_found': 0,
             'items': [],
+            'start_html': None,
             'error': 'Scraping timeout exceeded'
         }
 
@@ -144,6 +315,7 @@ def scrape_with_scrapy(url, timeout=30):
             'success': True,
             'pages_found': results['pages_scraped'],
             'items': results['items'],
+            'start_html': results.get('start_html'),
             'error': None
         }
     except Empty:
@@ -151,6 +323,7 @@ def scrape_with_scrapy(url, timeout=30):
             'success': False,
             'pages_found': 0,
             'items': [],
+            'start_html': None,
             'error': 'No results returned from spider'
         }
 
@@ -1,10 +1,14 @@
 """
 Flask server to expose scraping service as HTTP API
 """
-from flask import Flask, request, jsonify
+import startup  # First, so the startup report measures from process start
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
+import json
 import logging
-from scraper_orchestrator import scrape_website
+from contextlib import ExitStack
+from scraper_orchestrator import scrape_website, scrape_website_stream
+import capacity
 
 # Configure logging
 logging.basicConfig(
@@ -17,10 +21,55 @@ app = Flask(__name__)
 CORS(app)  # Enable CORS for Next.js to call this service
 
 
+def _busy_response(e, url, tenant, priority):
+    """429 response for a request shed by admission control"""
+    logger.warning(f"Shedding scrape request for {url} (tenant: {tenant}, priority: {priority}): {e}")
+    response = jsonify({
+        'status': 'error',
+        'message': '1. The scraper is busy right now\n2. Please try again shortly',
+        'error_details': str(e),
+        'retry_after': e.retry_after,
+        'queue_depth': e.queue_depth,
+        'estimated_wait_seconds': e.estimated_wait
+    })
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 429
+
+
+def _sse(event, data):
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'service': 'scraper'}), 200
+    """
+    Health check endpoint (liveness)
+
+    Reports real scrape capacity across all workers. Always 200 while the
+    process can answer, so a busy service is never restarted - use /ready
+    to route traffic away from a saturated one.
+    """
+    return jsonify({'service': 'scraper', **capacity.snapshot()}), 200
+
+
+@app.route('/ready', methods=['GET'])
+def readiness_check():
+    """
+    Readiness endpoint
+
+    Same body as /health, but returns 503 while every scrape slot is busy
+    and requests are queueing, so load balancers can route new scans elsewhere.
+    """
+    stats = capacity.snapshot()
+    status_code = 200 if stats['status'] == 'healthy' else 503
+    return jsonify({'service': 'scraper', **stats}), status_code
+
+
+@app.route('/startup', methods=['GET'])
+def startup_info():
+    """Startup report: time to ready, import time per module, pre-warm status"""
+    return jsonify(startup.startup_report()), 200
 
 
 @app.route('/scrape', methods=['POST'])
@@ -30,15 +79,21 @@ def scrape():
 
     Expected POST body:
     {
-        "url": "https://example.com"
+        "url": "https://example.com",
+        "priority": "interactive" | "batch"  (optional, default interactive)
     }
 
+    Requests are queued fairly per tenant (X-Tenant-ID header, falling
+    back to the client IP). When the queue is full or the estimated wait
+    is too long, responds 429 with a Retry-After header instead.
+
     Returns:
     {
         "status": "success" | "error",
         "message": "1. Item one\n2. Item two\n...",
         "method_used": "scrapy" | "playwright",
-        "pages_found": 5
+        "pages_found": 5,
+        "queue_wait_seconds": 0.0
     }
     """
     try:
@@ -59,8 +114,17 @@ def scrape():
 
         logger.info(f"Received scrape request for: {url}")
 
-        # Perform scraping
-        result = scrape_website(url)
+        tenant = request.headers.get('X-Tenant-ID') or request.remote_addr or 'anonymous'
+        priority = data.get('priority') or request.headers.get('X-Priority') or 'interactive'
+
+        # Perform scraping (waits for a free scrape slot)
+        try:
+            with capacity.scrape_slot(tenant, priority) as queue_wait:
+                result = scrape_website(url)
+        except capacity.Overloaded as e:
+            return _busy_response(e, url, tenant, priority)
+
+        result['queue_wait_seconds'] = round(queue_wait, 2)
 
         # Return results
         status_code = 200 if result['status'] == 'success' else 500
@@ -75,11 +139,83 @@ def scrape():
         }), 500
 
 
+@app.route('/scrape/stream', methods=['POST'])
+def scrape_stream():
+    """
+    Scrape a website and stream the snippets as Server-Sent Events
+
+    Same POST body, headers and admission control as /scrape. Snippets
+    are sent as soon as the LLM finishes each one, instead of after the
+    whole response.
+
+    Events:
+        event: status   data: {"stage": "queued" | "scraping" | "extracting", ...}
+        event: snippet  data: {"index": 1, "text": "..."}
+        event: done     data: same fields as the /scrape response
+    """
+    data = request.get_json(silent=True) or {}
+    url = data.get('url')
+
+    if not url:
+        return jsonify({
+            'status': 'error',
+            'message': '1. URL parameter is required',
+            'error_details': 'Missing URL in request body'
+        }), 400
+
+    # Validate URL format
+    if not url.startswith(('http://', 'https://')):
+        url = f'http://{url}'
+
+    logger.info(f"Received streaming scrape request for: {url}")
+
+    tenant = request.headers.get('X-Tenant-ID') or request.remote_addr or 'anonymous'
+    priority = data.get('priority') or request.headers.get('X-Priority') or 'interactive'
+
+    # Take the scrape slot before responding, so a busy service can still answer 429;
+    # the slot is released when the stream ends or the client disconnects
+    slot = ExitStack()
+    try:
+        queue_wait = slot.enter_context(capacity.scrape_slot(tenant, priority))
+    except capacity.Overloaded as e:
+        return _busy_response(e, url, tenant, priority)
+
+    def events():
+        with slot:
+            yield _sse('status', {'stage': 'queued', 'queue_wait_seconds': round(queue_wait, 2)})
+            try:
+                for event in scrape_website_stream(url):
+                    name = event.pop('event')
+                    if name == 'done':
+                        event['queue_wait_seconds'] = round(queue_wait, 2)
+                    yield _sse(name, event)
+            except Exception as e:
+                logger.error(f"Error in streaming scrape endpoint: {str(e)}", exc_info=True)
+                yield _sse('done', {
+                    'status': 'error',
+                    'message': '1. Internal server error occurred while scraping',
+                    'error_details': str(e)
+                })
+
+    response = Response(stream_with_context(events()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Don't let nginx buffer the stream
+    })
+    # Also covers a client that disconnects before the stream starts (ExitStack closes once)
+    response.call_on_close(slot.close)
+    return response
+
+
 if __name__ == '__main__':
     import os
 
     port = int(os.environ.get('SCRAPER_PORT', 5001))
     debug = os.environ.get('FLASK_ENV') == 'development'
 
-    logger.info(f"Starting scraper service on port {port}...")
-    app.run(host='0.0.0.0', port=port, debug=debug)
+    logger.info(f"Starting scraper service on port {port} (development server)...")
+    logger.info("For production use: gunicorn -c gunicorn.conf.py server:app")
+    startup.mark_ready()
+    # Flask's reloader runs the app in a child process; only pre-warm there
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        startup.start_prewarm()
+    app.run(host='0.0.0.0', port=port, debug=debug, threaded=True)
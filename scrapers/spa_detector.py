@@ -0,0 +1,134 @@
+"""
+SPA detection
+Inspects already-downloaded HTML to decide whether a page needs a real
+browser to render its content, so we only pay for Playwright when needed
+"""
+import logging
+import re
+from urllib.parse import urlparse
+from bs4 import BeautifulSoup
+from strategy_memory import detect_platform
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MIN_TEXT_LENGTH = 500  # Less visible text than this and the page is probably rendered client-side
+HEAVY_SCRIPT_RATIO = 0.5  # Share of the HTML taken up by inline script
+MOUNT_POINT_IDS = ['root', 'app', '__next', '__nuxt', '___gatsby', 'svelte']
+NOSCRIPT_WARNING = re.compile(r'(enable|requires?|need|turn on)\s+javascript', re.IGNORECASE)
+
+
+def analyze_html(html):
+    """
+    Look for signs that a page's content is rendered by JavaScript
+
+    Signals:
+    - An empty framework mount point (<div id="root"></div> and friends)
+    - A <noscript> warning asking the visitor to enable JavaScript
+    - Very little visible text, or inline script outweighing the content
+
+    Args:
+        html: Raw HTML as downloaded (before any JavaScript runs)
+
+    Returns:
+        dict: {
+            'needs_rendering': bool,
+            'reasons': list of str,
+            'text_length': int (visible text characters),
+            'script_count': int,
+            'platform': str | None (see strategy_memory.detect_platform)
+        }
+    """
+    if not html:
+        return {
+            'needs_rendering': True,
+            'reasons': ['no html'],
+            'text_length': 0,
+            'script_count': 0,
+            'platform': None
+        }
+
+    soup = BeautifulSoup(html, 'lxml')
+    reasons = []
+
+    scripts = soup.find_all('script')
+    inline_script_chars = sum(len(s.string or '') for s in scripts)
+
+    for element_id in MOUNT_POINT_IDS:
+        mount = soup.find(id=element_id)
+        if mount is not None and not mount.get_text(strip=True) and not mount.find(['img', 'a', 'p']):
+            reasons.append(f'empty mount point #{element_id}')
+            break
+
+    for noscript in soup.find_all('noscript'):
+        if NOSCRIPT_WARNING.search(noscript.get_text(' ', strip=True)):
+            reasons.append('noscript warning')
+            break
+
+    for element in soup(['script', 'style', 'noscript', 'template']):
+        element.decompose()
+    body = soup.body or soup
+    text_length = len(body.get_text(' ', strip=True))
+
+    if text_length < MIN_TEXT_LENGTH:
+        reasons.append(f'little visible text ({text_length} chars)')
+    elif inline_script_chars > len(html) * HEAVY_SCRIPT_RATIO:
+        reasons.append('script-heavy page')
+
+    return {
+        'needs_rendering': bool(reasons),
+        'reasons': reasons,
+        'text_length': text_length,
+        'script_count': len(scripts),
+        'platform': detect_platform(html)
+    }
+
+
+def merge_results(rendered, crawled):
+    """
+    Merge Scrapy results into a Playwright result instead of discarding them
+
+    The rendered page wins for URLs both scrapers saw, with any headings or
+    paragraphs only Scrapy found appended. Pages only Scrapy reached are
+    kept as-is, so the fallback covers everything either scraper found.
+
+    Args:
+        rendered: Playwright results (see scrape_with_playwright)
+        crawled: Scrapy results (see scrape_with_scrapy), may be None
+
+    Returns:
+        dict: Playwright-shaped results with the merged 'items' and 'pages_found'
+    """
+    if not crawled or not crawled.get('items'):
+        return rendered
+
+    def normalize(url):
+        # Treat http/https, www/non-www and trailing slashes as the same page
+        parsed = urlparse(url)
+        netloc = parsed.netloc.lower()
+        netloc = netloc[4:] if netloc.startswith('www.') else netloc
+        return netloc + parsed.path.rstrip('/') + ('?' + parsed.query if parsed.query else '')
+
+    items = [dict(page) for page in rendered['items']]
+    by_url = {normalize(page['url']): page for page in items}
+
+    for page in crawled['items']:
+        existing = by_url.get(normalize(page['url']))
+        if existing is None:
+            page = {'lists': [], **page}
+            items.append(page)
+            by_url[normalize(page['url'])] = page
+            continue
+
+        for key in ('headings', 'paragraphs', 'links'):
+            merged = list(existing.get(key, []))
+            merged.extend(value for value in page.get(key, []) if value not in merged)
+            existing[key] = merged
+
+    logger.info(f"Merged {len(crawled['items'])} Scrapy page(s) into rendered result: {len(items)} page(s) total")
+
+    return {
+        **rendered,
+        'pages_found': len(items),
+        'items': items
+    }
@@ -0,0 +1,213 @@
+"""
+Startup profiling and pre-warming
+Keeps heavy scraping dependencies out of the import path of server.py,
+reports how long each of them takes to import, and optionally loads them
+in the background once the server is already answering health checks
+"""
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Heavy dependencies per strategy, third-party packages before our own modules
+# so each package's import time is measured on its own
+STRATEGY_MODULES = {
+    'scrapy': ['lxml.etree', 'bs4', 'scrapy', 'scrapy.crawler', 'scrapy_scraper', 'spa_detector'],
+    'playwright': ['playwright.sync_api', 'playwright_scraper'],
+    'openai': ['openai', 'openai_extractor'],
+}
+
+PROCESS_START = time.time()
+
+_report = {
+    'pid': os.getpid(),
+    'process_start': PROCESS_START,
+    'ready_seconds': None,
+    'imports': [],
+    'prewarm': 'not started',
+    'browser_warm_seconds': None,
+}
+_report_lock = threading.Lock()
+
+# Clear while the pre-warm thread is importing. Forking then could leave the
+# child holding an import lock, so anything that forks waits on this first
+_imports_settled = threading.Event()
+_imports_settled.set()
+
+
+def mark_ready():
+    """Record how long the process took to start serving requests"""
+    with _report_lock:
+        _report['ready_seconds'] = round(time.time() - _report['process_start'], 3)
+    logger.info(f"Scraper service ready in {_report['ready_seconds']}s")
+
+
+def after_fork():
+    """Restart the clock for a freshly forked worker (imports done in the master are kept)"""
+    with _report_lock:
+        _report['pid'] = os.getpid()
+        _report['process_start'] = time.time()
+        _report['ready_seconds'] = None
+
+
+def profile_imports(strategies=None):
+    """
+    Import the modules used by the given strategies and time each one
+
+    Modules already imported report 0 seconds, so calling this again
+    (or after the first scrape) is cheap.
+
+    Args:
+        strategies: Iterable of keys from STRATEGY_MODULES (default: all)
+
+    Returns:
+        list: [{'strategy': str, 'module': str, 'seconds': float,
+                'modules_loaded': int, 'error': str | None}, ...]
+    """
+    timings = []
+
+    for strategy in strategies or STRATEGY_MODULES:
+        for module in STRATEGY_MODULES[strategy]:
+            already_loaded = len(sys.modules)
+            start = time.perf_counter()
+            error = None
+            try:
+                importlib.import_module(module)
+            except Exception as e:
+                error = str(e)
+                logger.warning(f"Could not import {module}: {e}")
+
+            timings.append({
+                'strategy': strategy,
+                'module': module,
+                'seconds': round(time.perf_counter() - start, 4),
+                'modules_loaded': len(sys.modules) - already_loaded,
+                'error': error,
+            })
+
+    with _report_lock:
+        _report['imports'].extend(timings)
+
+    return timings
+
+
+def warm_browser():
+    """
+    Launch and close Chromium once so the first Playwright scrape does not
+    pay for cold disk caches. Failures are logged, never raised.
+    """
+    start = time.perf_counter()
+    try:
+        from playwright.sync_api import sync_playwright
+
+        with sync_playwright() as p:
+            browser = p.chromium.launch(headless=True)
+            browser.close()
+    except Exception as e:
+        logger.warning(f"Browser pre-warm failed: {e}")
+        return
+
+    with _report_lock:
+        _report['browser_warm_seconds'] = round(time.perf_counter() - start, 3)
+
+
+def _prewarm(strategies, browser):
+    with _report_lock:
+        _report['prewarm'] = 'running'
+
+    start = time.perf_counter()
+    try:
+        timings = profile_imports(strategies)
+    finally:
+        _imports_settled.set()
+    if browser:
+        warm_browser()
+
+    with _report_lock:
+        _report['prewarm'] = 'done'
+
+    slowest = sorted(timings, key=lambda t: t['seconds'], reverse=True)[:3]
+    logger.info(
+        f"Pre-warm finished in {time.perf_counter() - start:.2f}s (slowest: "
+        + ', '.join(f"{t['module']} {t['seconds']:.2f}s" for t in slowest) + ")"
+    )
+
+
+def start_prewarm():
+    """
+    Start pre-warming in a background thread, if enabled
+
+    Controlled by SCRAPER_PREWARM (default: true) and
+    SCRAPER_PREWARM_BROWSER (default: false). Call this only after the
+    process has forked, since importing in a thread while forking can
+    leave the child holding an import lock. For the same reason, request
+    threads that fork call wait_for_prewarm() first.
+
+    Returns:
+        threading.Thread | None: The pre-warm thread, or None if disabled
+    """
+    if os.environ.get('SCRAPER_PREWARM', 'true').lower() != 'true':
+        with _report_lock:
+            _report['prewarm'] = 'disabled'
+        return None
+
+    browser = os.environ.get('SCRAPER_PREWARM_BROWSER', 'false').lower() == 'true'
+    _imports_settled.clear()
+    thread = threading.Thread(target=_prewarm, args=(None, browser), name='prewarm', daemon=True)
+    thread.start()
+    return thread
+
+
+def wait_for_prewarm(timeout=30):
+    """
+    Block until the pre-warm thread has finished importing
+
+    Call before forking from a request thread (e.g. the Scrapy child
+    process). Returns immediately if pre-warm is disabled or done.
+
+    Args:
+        timeout: Maximum seconds to wait
+
+    Returns:
+        bool: True if imports are settled, False if the wait timed out
+    """
+    if not _imports_settled.wait(timeout):
+        logger.warning(f"Pre-warm still importing after {timeout}s, forking anyway")
+        return False
+    return True
+
+
+def startup_report():
+    """
+    Return the startup report for this process
+
+    Returns:
+        dict: {
+            'pid': int,
+            'process_start': float (unix time),
+            'ready_seconds': float | None (time until serving requests),
+            'imports': list (see profile_imports),
+            'prewarm': 'not started' | 'disabled' | 'running' | 'done',
+            'browser_warm_seconds': float | None
+        }
+    """
+    with _report_lock:
+        return {**_report, 'imports': list(_report['imports'])}
+
+
+if __name__ == '__main__':
+    # Profile a cold import of every strategy in a fresh process
+    timings = profile_imports()
+    width = max(len(t['module']) for t in timings)
+
+    print(f"\n{'Module':<{width}}  {'Strategy':<10}  {'Seconds':>8}  {'Loaded':>6}")
+    print('-' * (width + 32))
+    for t in timings:
+        note = f"  ({t['error']})" if t['error'] else ''
+        print(f"{t['module']:<{width}}  {t['strategy']:<10}  {t['seconds']:>8.3f}  {t['modules_loaded']:>6}{note}")
+    print(f"\nTotal: {sum(t['seconds'] for t in timings):.3f}s")
@@ -0,0 +1,318 @@
+"""
+Strategy Memory
+Remembers which scraping strategy worked for each domain and platform
+so repeat scans can skip futile Scrapy runs on client-rendered sites
+"""
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MEMORY_PATH = os.environ.get(
+    'STRATEGY_MEMORY_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.strategy_memory.json')
+)
+REPROBE_EVERY = int(os.environ.get('STRATEGY_REPROBE_EVERY', 10))  # Full Scrapy-first scan every N scans
+REPROBE_SECONDS = int(os.environ.get('STRATEGY_REPROBE_SECONDS', 7 * 24 * 3600))  # ...or once a week
+MIN_PLATFORM_SAMPLES = 3  # Platform records need this many scans before we trust them
+MAX_DOMAINS = int(os.environ.get('STRATEGY_MEMORY_MAX_DOMAINS', 5000))  # Least recently scanned are dropped first
+EXPIRE_SECONDS = int(os.environ.get('STRATEGY_MEMORY_EXPIRE_SECONDS', 90 * 24 * 3600))  # Forget domains not scanned since
+PROBE_UNKNOWN = os.environ.get('STRATEGY_PROBE', 'false').lower() == 'true'  # Extra pre-Scrapy fetch for new domains
+
+# Markers that identify site builders / client-rendered frameworks in raw HTML
+PLATFORM_MARKERS = {
+    'wix': [r'static\.wixstatic\.com', r'wix-code', r'X-Wix-'],
+    'squarespace': [r'static1\.squarespace\.com', r'Squarespace\.', r'squarespace-cdn'],
+    'webflow': [r'data-wf-page', r'webflow\.js'],
+    'shopify': [r'cdn\.shopify\.com', r'Shopify\.theme'],
+    'wordpress': [r'wp-content/', r'wp-includes/'],
+    'nextjs': [r'id="__next"', r'/_next/static/'],
+    'gatsby': [r'id="___gatsby"'],
+    'nuxt': [r'id="__nuxt"', r'window\.__NUXT__'],
+    'react-spa': [r'<div id="root">\s*</div>', r'data-reactroot'],
+    'angular': [r'ng-version=', r'<app-root'],
+    'vue-spa': [r'<div id="app">\s*</div>'],
+}
+
+_lock = threading.Lock()
+
+
+@contextmanager
+def _locked():
+    """
+    Hold the memory file for a read-modify-write
+
+    The threading lock serializes threads in this process; flock on a
+    sidecar lock file serializes gunicorn workers, which would otherwise
+    overwrite each other's updates.
+    """
+    with _lock:
+        if fcntl is None:
+            yield
+            return
+
+        try:
+            lock_file = open(MEMORY_PATH + '.lock', 'a')
+        except OSError as e:
+            logger.warning(f"Could not open strategy memory lock file: {e}")
+            yield
+            return
+
+        with lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def domain_key(url):
+    """
+    Normalize a URL to the domain key used in the memory file
+
+    Args:
+        url: Website URL
+
+    Returns:
+        str: Lowercased host without a leading "www."
+    """
+    netloc = urlparse(url).netloc.lower()
+    return netloc[4:] if netloc.startswith('www.') else netloc
+
+
+def detect_platform(html):
+    """
+    Fingerprint the platform/framework a page was built with
+
+    Args:
+        html: Raw HTML of the page
+
+    Returns:
+        str | None: Platform name from PLATFORM_MARKERS, or None if unknown
+    """
+    if not html:
+        return None
+
+    for platform, patterns in PLATFORM_MARKERS.items():
+        if any(re.search(pattern, html, re.IGNORECASE) for pattern in patterns):
+            return platform
+
+    return None
+
+
+def probe_page(url, timeout=3):
+    """
+    Fetch the start page cheaply so an unknown domain can be fingerprinted
+
+    Only used for domains we have never seen, and only when STRATEGY_PROBE
+    is enabled: it is a second fetch of the start page on top of Scrapy's,
+    so by default new domains go to Scrapy and are fingerprinted from the
+    HTML Scrapy downloads instead.
+
+    Args:
+        url: Website URL
+        timeout: Request timeout in seconds
+
+    Returns:
+        str | None: Raw HTML, or None if the fetch failed
+    """
+    import requests
+
+    try:
+        response = requests.get(url, timeout=timeout, headers={
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+        })
+        return response.text
+    except Exception as e:
+        logger.warning(f"Page probe failed for {url}: {e}")
+        return None
+
+
+def _load():
+    """Read the memory file, returning an empty structure if missing or corrupt"""
+    try:
+        with open(MEMORY_PATH, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        data = {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read strategy memory ({e}), starting fresh")
+        data = {}
+
+    data.setdefault('domains', {})
+    data.setdefault('platforms', {})
+    return data
+
+
+def _save(data):
+    """Write the memory file atomically so concurrent workers never see a partial file"""
+    directory = os.path.dirname(MEMORY_PATH) or '.'
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.strategy_memory.', suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, MEMORY_PATH)
+    except OSError as e:
+        logger.warning(f"Could not write strategy memory: {e}")
+
+
+def _prune(data):
+    """Drop expired domains, then the least recently scanned ones beyond MAX_DOMAINS"""
+    domains = data['domains']
+    cutoff = time.time() - EXPIRE_SECONDS
+
+    for key in [key for key, entry in domains.items() if entry.get('updated_at', 0) < cutoff]:
+        del domains[key]
+
+    if len(domains) > MAX_DOMAINS:
+        newest = sorted(domains, key=lambda key: domains[key].get('updated_at', 0), reverse=True)
+        for key in newest[MAX_DOMAINS:]:
+            del domains[key]
+
+
+def _update_entry(entry, strategy, success, pages_found, duration, scrapy_attempted, scrapy_futile):
+    """Fold one scan outcome into a domain or platform record"""
+    stats = entry.setdefault('strategies', {}).setdefault(strategy, {
+        'successes': 0,
+        'failures': 0,
+        'avg_pages': 0.0,
+        'avg_duration': 0.0,
+    })
+
+    if success:
+        n = stats['successes']
+        stats['avg_pages'] = (stats['avg_pages'] * n + pages_found) / (n + 1)
+        stats['avg_duration'] = (stats['avg_duration'] * n + duration) / (n + 1)
+        stats['successes'] = n + 1
+    else:
+        stats['failures'] += 1
+
+    entry['scans'] = entry.get('scans', 0) + 1
+    entry['scrapy_attempts'] = entry.get('scrapy_attempts', 0) + (1 if scrapy_attempted else 0)
+    entry['futile_scrapy'] = entry.get('futile_scrapy', 0) + (1 if scrapy_futile else 0)
+    entry['updated_at'] = time.time()
+
+    # Scrapy is futile here if it has come back with <= 1 page more often than not
+    if success:
+        if strategy == 'playwright' and entry['futile_scrapy'] * 2 >= entry['scrapy_attempts']:
+            entry['preferred'] = 'playwright'
+        elif strategy == 'scrapy':
+            entry['preferred'] = 'scrapy'
+
+
+def recommend_strategy(url, probe=None):
+    """
+    Decide which strategy to start with for a URL
+
+    Known domains use their own history (with a periodic Scrapy-first
+    re-probe). Unknown domains start with Scrapy, unless probing is
+    enabled: then they are fingerprinted and borrow the history of other
+    sites on the same platform, and with no platform history the probed
+    HTML itself decides whether the page needs rendering.
+
+    Args:
+        url: Website URL about to be scraped
+        probe: Whether to fetch the start page to fingerprint unknown domains
+            (default: STRATEGY_PROBE)
+
+    Returns:
+        dict: {
+            'strategy': 'scrapy' | 'playwright',
+            'source': 'domain' | 'platform' | 'reprobe' | 'probe' | 'default',
+            'platform': str | None
+        }
+    """
+    # No lock needed to read: _save replaces the file atomically
+    data = _load()
+
+    domain = data['domains'].get(domain_key(url))
+
+    if probe is None:
+        probe = PROBE_UNKNOWN
+
+    html = None
+    if domain:
+        platform = domain.get('platform')
+        if domain.get('preferred'):
+            scans_since_probe = domain.get('scans_since_probe', 0)
+            probe_age = time.time() - domain.get('last_probe_at', 0)
+            if scans_since_probe >= REPROBE_EVERY or probe_age >= REPROBE_SECONDS:
+                return {'strategy': 'scrapy', 'source': 'reprobe', 'platform': platform}
+            return {'strategy': domain['preferred'], 'source': 'domain', 'platform': platform}
+    else:
+        html = probe_page(url) if probe else None
+        platform = detect_platform(html)
+
+    record = data['platforms'].get(platform) if platform else None
+    if record and record.get('preferred') and record.get('scans', 0) >= MIN_PLATFORM_SAMPLES:
+        return {'strategy': record['preferred'], 'source': 'platform', 'platform': platform}
+
+    if html:
+        from spa_detector import analyze_html
+
+        analysis = analyze_html(html)
+        if analysis['needs_rendering']:
+            logger.info(f"Probe suggests client-side rendering: {', '.join(analysis['reasons'])}")
+            return {'strategy': 'playwright', 'source': 'probe', 'platform': platform}
+
+    return {'strategy': 'scrapy', 'source': 'default', 'platform': platform}
+
+
+def record_outcome(url, strategy, success, pages_found, duration,
+                   scrapy_attempted=True, scrapy_futile=False, platform=None):
+    """
+    Persist the outcome of a scan for future strategy decisions
+
+    Args:
+        url: Website URL that was scraped
+        strategy: Strategy that produced the result ('scrapy' | 'playwright')
+        success: Whether the strategy returned usable content
+        pages_found: Number of pages the strategy found
+        duration: Wall-clock seconds the strategy took
+        scrapy_attempted: True if Scrapy ran during this scan (resets the re-probe counter)
+        scrapy_futile: True if Scrapy ran during this scan and found <= 1 page
+        platform: Optional platform fingerprint to update alongside the domain
+    """
+    with _locked():
+        data = _load()
+
+        domain = data['domains'].setdefault(domain_key(url), {})
+        _update_entry(domain, strategy, success, pages_found, duration,
+                      scrapy_attempted, scrapy_futile)
+        if platform:
+            domain['platform'] = platform
+            _update_entry(data['platforms'].setdefault(platform, {}),
+                          strategy, success, pages_found, duration,
+                          scrapy_attempted, scrapy_futile)
+
+        if scrapy_attempted:
+            domain['scans_since_probe'] = 0
+            domain['last_probe_at'] = time.time()
+        else:
+            domain['scans_since_probe'] = domain.get('scans_since_probe', 0) + 1
+
+        _prune(data)
+        _save(data)
+
+
+if __name__ == '__main__':
+    # Show what the memory currently knows
+    import sys
+
+    if len(sys.argv) > 1:
+        print(json.dumps(recommend_strategy(sys.argv[1]), indent=2))
+    else:
+        print(json.dumps(_load(), indent=2))
@@ -0,0 +1,236 @@
+"""
+URL Frontier
+Collects candidate pages from robots.txt sitemaps, sitemap indexes and
+on-page links, and hands out the most valuable ones first so the spider
+can fill its page budget in one parallel wave
+"""
+import gzip
+import heapq
+import io
+import logging
+import re
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+from lxml import etree
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAX_SITEMAP_ENTRIES = 5000  # Stop parsing a sitemap after this many entries
+
+# Path keywords that usually lead to the pages describing a business
+VALUABLE_PATHS = re.compile(
+    r'about|service|product|solution|pricing|price|feature|team|contact|faq|'
+    r'menu|location|work|portfolio|testimonial|review|company|what-we-do|how-it-works',
+    re.IGNORECASE
+)
+# Path keywords for pages that rarely say anything about the business itself
+LOW_VALUE_PATHS = re.compile(
+    r'/(tag|tags|category|categories|author|page/\d+|feed|wp-json|wp-admin|wp-content|'
+    r'login|signin|signup|register|cart|checkout|account|search|privacy|terms|legal|'
+    r'cookie|sitemap)(/|$)|\d{4}/\d{2}/',
+    re.IGNORECASE
+)
+SKIP_EXTENSIONS = re.compile(
+    r'\.(pdf|jpe?g|png|gif|svg|webp|ico|css|js|json|xml|zip|gz|mp4|mp3|docx?|xlsx?)$',
+    re.IGNORECASE
+)
+
+
+def sitemaps_from_robots(robots_txt):
+    """
+    Extract Sitemap: entries from a robots.txt file
+
+    Args:
+        robots_txt: Text of robots.txt
+
+    Returns:
+        list: Sitemap URLs in the order listed
+    """
+    sitemaps = []
+    for line in robots_txt.splitlines():
+        key, _, value = line.partition(':')
+        if key.strip().lower() == 'sitemap' and value.strip():
+            sitemaps.append(value.strip())
+    return sitemaps
+
+
+def _parse_lastmod(value):
+    """Parse a W3C datetime (we only need the date), returning None if unparseable"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value.strip()[:10], '%Y-%m-%d').replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def iter_sitemap(body, max_entries=MAX_SITEMAP_ENTRIES):
+    """
+    Stream entries out of a sitemap or sitemap index without building the whole tree
+
+    Handles gzipped sitemaps and stops after max_entries, so very large
+    sitemaps cost little more than the entries we actually use.
+
+    Args:
+        body: Raw bytes of sitemap.xml, sitemap.xml.gz or a sitemap index
+        max_entries: Maximum number of entries to yield
+
+    Yields:
+        dict: {
+            'kind': 'url' | 'sitemap',
+            'loc': str,
+            'lastmod': datetime | None,
+            'priority': float | None
+        }
+    """
+    stream = io.BytesIO(body)
+    if body[:2] == b'\x1f\x8b':
+        stream = gzip.GzipFile(fileobj=stream)
+
+    count = 0
+    try:
+        for _, element in etree.iterparse(stream, events=('end',), tag=('{*}url', '{*}sitemap'),
+                                          recover=True, resolve_entities=False, no_network=True):
+            loc = element.findtext('{*}loc')
+            if loc:
+                priority = element.findtext('{*}priority')
+                try:
+                    priority = float(priority) if priority else None
+                except ValueError:
+                    priority = None
+
+                yield {
+                    'kind': etree.QName(element).localname,
+                    'loc': loc.strip(),
+                    'lastmod': _parse_lastmod(element.findtext('{*}lastmod')),
+                    'priority': priority
+                }
+                count += 1
+
+            # Free what we've already seen
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+            if count >= max_entries:
+                logger.info(f"Sitemap has more than {max_entries} entries, stopping early")
+                return
+    except (etree.XMLSyntaxError, OSError, EOFError) as e:
+        logger.warning(f"Could not parse sitemap: {e}")
+
+
+def score_url(url, lastmod=None, priority=None):
+    """
+    Estimate how useful a page is likely to be for describing the business
+
+    Args:
+        url: Page URL
+        lastmod: Last modification date from the sitemap, if any
+        priority: <priority> from the sitemap (0.0 - 1.0), if any
+
+    Returns:
+        float | None: Higher is better, or None if the URL is not worth fetching
+    """
+    path = urlparse(url).path or '/'
+    if SKIP_EXTENSIONS.search(path):
+        return None
+
+    segments = [s for s in path.split('/') if s]
+    score = 10.0 - 2.0 * len(segments)  # Shallow pages tend to be the important ones
+
+    if VALUABLE_PATHS.search(path):
+        score += 8.0
+    if LOW_VALUE_PATHS.search(path):
+        score -= 10.0
+
+    if priority is not None:
+        score += 4.0 * priority
+
+    if lastmod is not None:
+        age_days = (datetime.now(timezone.utc) - lastmod).days
+        score += max(0.0, 3.0 * (1 - age_days / 365))  # Up to +3 for pages updated this year
+
+    return score
+
+
+def score_sitemap(url):
+    """
+    Rank child sitemaps of a sitemap index by name (e.g. page-sitemap.xml
+    over post-sitemap.xml), since their URLs say little until opened
+
+    Args:
+        url: Child sitemap URL
+
+    Returns:
+        float: Higher is better
+    """
+    name = urlparse(url).path.rsplit('/', 1)[-1].lower()
+    score = 0.0
+    if re.search(r'page|service|product|main', name):
+        score += 2.0
+    if re.search(r'post|blog|news|tag|categor|author|image|video|attachment', name):
+        score -= 2.0
+    return score
+
+
+class UrlFrontier:
+    """Priority queue of candidate page URLs, each handed out at most once"""
+
+    def __init__(self):
+        self._heap = []
+        self._seen = set()
+        self._counter = 0  # Tie-breaker: earlier discoveries first
+
+    @staticmethod
+    def _key(url):
+        parsed = urlparse(url)
+        netloc = parsed.netloc.lower()
+        netloc = netloc[4:] if netloc.startswith('www.') else netloc  # Scheme and www. don't make a new page
+        return netloc + (parsed.path.rstrip('/') or '/') + ('?' + parsed.query if parsed.query else '')
+
+    def add(self, url, lastmod=None, priority=None, bonus=0.0):
+        """
+        Add a candidate URL (ignored if already added or not worth fetching)
+
+        Args:
+            url: Absolute page URL
+            lastmod: Last modification date from the sitemap, if any
+            priority: <priority> from the sitemap, if any
+            bonus: Extra score, e.g. for URLs listed in a sitemap
+
+        Returns:
+            bool: True if the URL was added
+        """
+        key = self._key(url.split('#')[0])
+        if key in self._seen:
+            return False
+
+        score = score_url(url, lastmod, priority)
+        if score is None:
+            return False
+
+        self._seen.add(key)
+        self._counter += 1
+        heapq.heappush(self._heap, (-(score + bonus), self._counter, url.split('#')[0]))
+        return True
+
+    def mark_seen(self, url):
+        """Record a URL that was fetched outside the frontier (e.g. the start page)"""
+        self._seen.add(self._key(url.split('#')[0]))
+
+    def pop(self, k):
+        """
+        Take the k best URLs
+
+        Returns:
+            list: [(url, score), ...] best first
+        """
+        batch = []
+        while self._heap and len(batch) < k:
+            neg_score, _, url = heapq.heappop(self._heap)
+            batch.append((url, -neg_score))
+        return batch
+
+    def __len__(self):
+        return len(self._heap)